@@ -1,16 +1,24 @@
+import io
 import os
 import json
+import bisect
 import asyncio
+import threading
 import logging
 import datetime
 import gspread
-import hashlib
 import numpy as np
-import matplotlib.pyplot as plt
 
-from aiogram import Bot, Dispatcher, types
+from aiogram import Bot, Dispatcher, types, F
 from aiogram.filters import Command
-from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, FSInputFile
+from aiogram.types import ReplyKeyboardMarkup, KeyboardButton, BufferedInputFile
+
+# Numba необязательна: при её наличии агрегация по периодам компилируется
+# в машинный код, без неё остаются векторные операции NumPy
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # ======== Настройка токена и логирования ==========
 logging.basicConfig(level=logging.INFO)
@@ -69,57 +77,237 @@ else:
 # ======== Глобальные переменные ==========
 pending_inputs = {}         # Для хранения выбора пользователя: {user_id: {"type": str, "category": str}}
 records = []                # Все финансовые записи, загружаемые из Google Sheets
+_record_ids = set()         # ID всех записей для быстрой проверки дубликатов
+_last_rows = {"Доходы": 0, "Расходы": 0}   # Строк обработано на листе (вместе с заголовком)
+_headers = {}               # Заголовки листов для разбора дочитанных строк
+_last_row_data = {}         # Последняя известная строка листа для контроля перекрытия
+
+# Сериализует любые изменения records/_record_ids/_last_rows и SoA-массивов:
+# загрузка, дочитывание и сохранение выполняются в потоках из пула, а читатели
+# работают на event loop. RLock — т.к. refresh_records откатывается
+# на load_records, не отпуская блокировку.
+_records_lock = threading.RLock()
+
+# SoA-представление записей: параллельные массивы NumPy для векторных агрегаций.
+# Суммы по периодам считаются маскированными операциями над непрерывной памятью
+# вместо обхода списка словарей.
+_amounts = np.empty(0, dtype=np.float64)
+_types = np.empty(0, dtype=np.uint8)          # 0 = доход, 1 = расход
+_dates = np.empty(0, dtype="datetime64[s]")
 registered_users = set()    # ID пользователей для автоматической рассылки отчётов
 
 # ---------------------------------------------------------------------------- #
 #                      Функции работы с записями и графиками                     #
 # ---------------------------------------------------------------------------- #
-def get_record_id(record: dict) -> str:
-    """Генерирует уникальный ID для записи на основе её полей."""
-    hash_input = f"{record['date']}-{record['type']}-{record['category']}-{record['amount']}-{record['comment']}"
-    return hashlib.md5(hash_input.encode('utf-8')).hexdigest()
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def _fast_parse(s: str) -> datetime.datetime:
+    """
+    Разбирает дату фиксированного формата "%Y-%m-%d %H:%M:%S" срезами строки,
+    минуя разбор форматной строки в strptime. Быстрый путь включается только
+    для строк ровно этой формы (длина и разделители проверяются явно);
+    всё остальное уходит в strptime, чтобы некорректные строки отклонялись
+    и логировались как раньше.
+    """
+    if (isinstance(s, str) and len(s) == 19
+            and s[4] == "-" and s[7] == "-" and s[10] == " "
+            and s[13] == ":" and s[16] == ":"):
+        try:
+            return datetime.datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                                     int(s[11:13]), int(s[14:16]), int(s[17:19]))
+        except ValueError:
+            pass
+    return datetime.datetime.strptime(s, DATE_FORMAT)
+
+# Кэш разобранных дат: одинаковые строки (записи одной минуты, бэкфиллы)
+# встречаются часто, повторный разбор не нужен
+_DT_CACHE: dict = {}
+
+def _parse_dt(s: str) -> datetime.datetime:
+    """Разбирает строку даты, кэшируя результат по самой строке."""
+    dt = _DT_CACHE.get(s)
+    if dt is None:
+        dt = _fast_parse(s)
+        if len(_DT_CACHE) >= 4096:
+            _DT_CACHE.clear()
+        _DT_CACHE[s] = dt
+    return dt
+
+def _rebuild_arrays() -> None:
+    """Перестраивает SoA-массивы по текущему списку records."""
+    global _amounts, _types, _dates
+    n = len(records)
+    _amounts = np.fromiter((r["amount"] for r in records), dtype=np.float64, count=n)
+    _types = np.fromiter((r["_t"] for r in records), dtype=np.uint8, count=n)
+    _dates = np.array([r["_dt"] for r in records], dtype="datetime64[s]")
+
+def _append_arrays(record: dict) -> None:
+    """Дописывает одну запись в SoA-массивы (порядок для сумм не важен)."""
+    global _amounts, _types, _dates
+    _amounts = np.append(_amounts, record["amount"])
+    _types = np.append(_types, record["_t"])
+    _dates = np.append(_dates, np.datetime64(record["_dt"], "s"))
+
+if numba is not None:
+    @numba.njit(cache=True, fastmath=True)
+    def _agg_kernel(amounts, types, dates_s, week_s, month_start_s, month_end_s,
+                    year_start_s, year_end_s):
+        """
+        Считает суммы (доход, расход) за всё время/неделю/месяц/год одним
+        проходом по массивам; даты — int64-секунды. Возвращает матрицу 4x2.
+        """
+        sums = np.zeros((4, 2))
+        for i in range(amounts.shape[0]):
+            amount = amounts[i]
+            t = types[i]
+            d = dates_s[i]
+            sums[0, t] += amount
+            if d >= week_s:
+                sums[1, t] += amount
+            if month_start_s <= d < month_end_s:
+                sums[2, t] += amount
+            if year_start_s <= d < year_end_s:
+                sums[3, t] += amount
+        return sums
+else:
+    _agg_kernel = None
+
+def _month_bounds(now: datetime.datetime) -> tuple:
+    """Возвращает границы текущего месяца [начало, начало следующего)."""
+    start = datetime.datetime(now.year, now.month, 1)
+    if now.month == 12:
+        end = datetime.datetime(now.year + 1, 1, 1)
+    else:
+        end = datetime.datetime(now.year, now.month + 1, 1)
+    return start, end
+
+def get_record_id(record: dict) -> tuple:
+    """
+    Возвращает уникальный ID записи — кортеж её полей.
+    Криптографический хеш для дедупликации не нужен: кортеж хешируется
+    на порядки дешевле, чем MD5 от собранной строки.
+    """
+    return (record['date'], record['type'], record['category'],
+            record['amount'], record['comment'])
+
+def _parse_row(row: dict, trans_type: str):
+    """Преобразует строку листа в запись; возвращает None для некорректных строк."""
+    # Проверка обязательных полей
+    if not row.get("date") or not row.get("amount"):
+        return None
+    try:
+        record_date = row.get("date")
+        # Попытка конвертации даты (результат кэшируем в записи)
+        record_dt = _parse_dt(record_date)
+        record_amount = float(row.get("amount"))
+        return {
+            "date": record_date,
+            "type": trans_type,
+            "category": row.get("category"),
+            "amount": record_amount,
+            "comment": row.get("comment", ""),
+            "_dt": record_dt,
+            "_t": 0 if trans_type == "доход" else 1
+        }
+    except Exception as ex:
+        logging.error(f"Ошибка обработки строки ({trans_type}): {row} - {ex}")
+        return None
 
 def load_records() -> None:
     """Загружает все записи напрямую из Google Sheets."""
     global records
-    records = []
-    if gc:
-        try:
-            # Проходим по каждому листу и соответствующему типу транзакции
-            for sheet, trans_type in [(income_sheet, "доход"), (expense_sheet, "расход")]:
+    with _records_lock:
+        records = []
+        _record_ids.clear()
+        _last_rows.update({"Доходы": 0, "Расходы": 0})
+        _last_row_data.clear()
+        if gc:
+            try:
+                # Оба листа забираем одним batch-запросом вместо двух round-trip'ов
+                sheet_types = [("Доходы", "доход"), ("Расходы", "расход")]
                 try:
-                    data = sheet.get_all_records()
+                    batch = spreadsheet.values_batch_get([f"{name}!A:E" for name, _ in sheet_types])
+                    value_ranges = batch.get("valueRanges", [])
                 except Exception as e:
-                    logging.error(f"Ошибка получения данных с листа ({trans_type}): {e}")
-                    continue
-                for row in data:
-                    # Проверка обязательных полей
-                    if not row.get("date") or not row.get("amount"):
+                    logging.error(f"Ошибка пакетного получения данных с листов: {e}")
+                    value_ranges = []
+                for (sheet_name, trans_type), value_range in zip(sheet_types, value_ranges):
+                    values = value_range.get("values", [])
+                    _last_rows[sheet_name] = len(values)
+                    if not values:
                         continue
-                    try:
-                        record_date = row.get("date")
-                        # Попытка конвертации даты
-                        datetime.datetime.strptime(record_date, "%Y-%m-%d %H:%M:%S")
-                        record_amount = float(row.get("amount"))
-                        rec = {
-                            "date": record_date,
-                            "type": trans_type,
-                            "category": row.get("category"),
-                            "amount": record_amount,
-                            "comment": row.get("comment", "")
-                        }
+                    # Первая строка — заголовок; строим словари как get_all_records
+                    header = values[0]
+                    _headers[sheet_name] = header
+                    _last_row_data[sheet_name] = values[-1]
+                    for raw in values[1:]:
+                        rec = _parse_row(dict(zip(header, raw)), trans_type)
+                        if rec is None:
+                            continue
                         records.append(rec)
-                    except Exception as ex:
-                        logging.error(f"Ошибка обработки строки ({trans_type}): {row} - {ex}")
-            try:
-                records.sort(key=lambda r: datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S"))
+                        _record_ids.add(get_record_id(rec))
+                try:
+                    records.sort(key=lambda r: r["_dt"])
+                except Exception as e:
+                    logging.error(f"Ошибка сортировки записей: {e}")
+                _rebuild_arrays()
+                logging.info("Данные успешно загружены из Google Sheets.")
             except Exception as e:
-                logging.error(f"Ошибка сортировки записей: {e}")
-            logging.info("Данные успешно загружены из Google Sheets.")
-        except Exception as e:
-            logging.error(f"Ошибка загрузки данных из Google Sheets: {e}")
-    else:
+                logging.error(f"Ошибка загрузки данных из Google Sheets: {e}")
+        else:
+            logging.error("Google Sheets недоступен. Записи не загружены.")
+
+def refresh_records() -> None:
+    """
+    Инкрементально дочитывает только новые строки листов (листы append-only),
+    не перечитывая всю историю на каждом фоновом обновлении. Диапазон берётся
+    с перекрытием в одну строку: если последняя известная строка листа
+    не совпала, лист редактировали вне бота (строки удалены или изменены),
+    и выполняется полная перезагрузка. Она же — fallback при отсутствии
+    заголовков или любой ошибке запроса.
+    """
+    if not gc:
         logging.error("Google Sheets недоступен. Записи не загружены.")
+        return
+    with _records_lock:
+        if (len(_headers) < 2 or len(_last_row_data) < 2
+                or any(count < 1 for count in _last_rows.values())):
+            load_records()
+            return
+        try:
+            sheet_types = [("Доходы", "доход"), ("Расходы", "расход")]
+            ranges = [f"{name}!A{_last_rows[name]}:E" for name, _ in sheet_types]
+            batch = spreadsheet.values_batch_get(ranges)
+            value_ranges = batch.get("valueRanges", [])
+            for (sheet_name, trans_type), value_range in zip(sheet_types, value_ranges):
+                values = value_range.get("values", [])
+                # Перекрытие: первой должна вернуться последняя известная строка.
+                # Пустой ответ или другая строка означают, что лист сократили
+                # или переписали вне бота — инкремент больше не достоверен.
+                if not values or values[0] != _last_row_data[sheet_name]:
+                    logging.warning(f"Лист '{sheet_name}' изменён вне бота, полная перезагрузка.")
+                    load_records()
+                    return
+                new_rows = values[1:]
+                if not new_rows:
+                    continue
+                header = _headers[sheet_name]
+                for raw in new_rows:
+                    rec = _parse_row(dict(zip(header, raw)), trans_type)
+                    if rec is None:
+                        continue
+                    rec_id = get_record_id(rec)
+                    if rec_id in _record_ids:
+                        continue
+                    bisect.insort(records, rec, key=lambda r: r["_dt"])
+                    _record_ids.add(rec_id)
+                    _append_arrays(rec)
+                _last_rows[sheet_name] += len(new_rows)
+                _last_row_data[sheet_name] = values[-1]
+                logging.info(f"Лист '{sheet_name}': дочитано {len(new_rows)} новых строк.")
+        except Exception as e:
+            logging.error(f"Ошибка инкрементального обновления, полная перезагрузка: {e}")
+            load_records()
 
 def save_record_to_sheet(record: dict) -> None:
     """Сохраняет новую запись в соответствующий лист Google Sheets."""
@@ -140,92 +328,135 @@ def save_record(record: dict) -> bool:
     сохраняет её в Google Sheets и обновляет глобальный список.
     """
     record["id"] = get_record_id(record)
-    if any(get_record_id(r) == record["id"] for r in records):
-        logging.info("Дублирующая запись, не добавляем.")
-        return False
-    try:
-        save_record_to_sheet(record)
-        records.append(record)
+    with _records_lock:
+        if record["id"] in _record_ids:
+            logging.info("Дублирующая запись, не добавляем.")
+            return False
         try:
-            records.sort(key=lambda r: datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S"))
+            record["_dt"] = _parse_dt(record["date"])
+            record["_t"] = 0 if record["type"] == "доход" else 1
+            save_record_to_sheet(record)
+            # Список уже отсортирован по _dt, достаточно вставки в нужную позицию
+            bisect.insort(records, record, key=lambda r: r["_dt"])
+            _record_ids.add(record["id"])
+            _append_arrays(record)
+            return True
         except Exception as e:
-            logging.error(f"Ошибка сортировки записей: {e}")
-        return True
-    except Exception as e:
-        logging.error(f"Ошибка сохранения записи в Google Sheets: {e}")
-        return False
-
-def generate_chart(period_records: list, title: str) -> str:
+            logging.error(f"Ошибка сохранения записи в Google Sheets: {e}")
+            return False
+
+# Фигура и оси matplotlib создаются один раз и переиспользуются:
+# создание/закрытие фигуры на каждый график заметно дороже, чем ax.clear().
+# Графики рисуются в потоках из пула (asyncio.to_thread), поэтому доступ
+# к общей фигуре — и её ленивое создание — защищён блокировкой.
+_FIG = None
+_AX = None
+_chart_lock = threading.Lock()
+
+def _get_figure():
+    """Возвращает (лениво создавая) переиспользуемую пару Figure/Axes."""
+    global _FIG, _AX
+    if _FIG is None:
+        # matplotlib — самый тяжёлый импорт бота, поэтому подгружается только
+        # при первом построении графика; явный backend Agg избавляет
+        # от перебора GUI-бэкендов
+        import matplotlib
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _FIG, _AX = plt.subplots(figsize=(10, 6))
+    return _FIG, _AX
+
+def generate_chart(period_records: list, title: str) -> bytes:
     """
     Генерирует группированный столбчатый график для переданного периода,
     группируя данные по категориям для доходов и расходов.
-    Возвращает имя файла с сохраненным графиком.
+    Возвращает PNG-изображение в виде байтов.
     """
     try:
-        categories = sorted(list({r["category"] for r in period_records}))
+        # Группировка по категориям векторно: np.unique даёт отсортированные
+        # категории и индексы, bincount суммирует доходы/расходы за один проход
+        n = len(period_records)
+        cats = np.array([r["category"] for r in period_records], dtype=object)
+        amounts = np.fromiter((r["amount"] for r in period_records), dtype=np.float64, count=n)
+        is_income = np.fromiter((r["_t"] == 0 for r in period_records), dtype=bool, count=n)
+        categories, cat_idx = np.unique(cats, return_inverse=True)
+        incomes = np.bincount(cat_idx, weights=np.where(is_income, amounts, 0.0), minlength=len(categories))
+        expenses = np.bincount(cat_idx, weights=np.where(is_income, 0.0, amounts), minlength=len(categories))
+        categories = list(categories)
     except Exception as e:
         logging.error(f"Ошибка при сборе категорий: {e}")
         categories = []
-    income_by_cat = {cat: 0 for cat in categories}
-    expense_by_cat = {cat: 0 for cat in categories}
-    for r in period_records:
-        if r["type"] == "доход":
-            income_by_cat[r["category"]] += r["amount"]
-        elif r["type"] == "расход":
-            expense_by_cat[r["category"]] += r["amount"]
-    incomes = [income_by_cat.get(cat, 0) for cat in categories]
-    expenses = [expense_by_cat.get(cat, 0) for cat in categories]
+        incomes = []
+        expenses = []
 
     x = np.arange(len(categories))
     width = 0.35
 
-    fig, ax = plt.subplots(figsize=(10, 6))
-    ax.bar(x - width/2, incomes, width, label='Доходы')
-    ax.bar(x + width/2, expenses, width, label='Расходы')
-    ax.set_ylabel('Сумма (руб.)')
-    ax.set_title(title)
-    ax.set_xticks(x)
-    ax.set_xticklabels(categories, rotation=45, ha='right')
-    ax.legend()
-    plt.tight_layout()
-    filename = title.replace(" ", "_") + ".png"
-    try:
-        plt.savefig(filename)
-    except Exception as e:
-        logging.error(f"Ошибка сохранения графика: {e}")
-    plt.close(fig)
-    return filename
+    # Весь цикл рисования и сохранения — под блокировкой: параллельные запросы
+    # отчётов из разных потоков не должны перемешивать содержимое общих осей
+    with _chart_lock:
+        fig, ax = _get_figure()
+        ax.clear()
+        ax.bar(x - width/2, incomes, width, label='Доходы')
+        ax.bar(x + width/2, expenses, width, label='Расходы')
+        ax.set_ylabel('Сумма (руб.)')
+        ax.set_title(title)
+        ax.set_xticks(x)
+        ax.set_xticklabels(categories, rotation=45, ha='right')
+        ax.legend()
+        fig.tight_layout()
+        # Рисуем в память: без записи на диск и обратного чтения файла при отправке
+        buf = io.BytesIO()
+        try:
+            fig.savefig(buf, format="png")
+        except Exception as e:
+            logging.error(f"Ошибка сохранения графика: {e}")
+    return buf.getvalue()
 
-def generate_weekly_chart() -> str:
+def generate_weekly_chart() -> bytes:
     now = datetime.datetime.now()
     week_ago = now - datetime.timedelta(days=7)
-    period_records = [r for r in records if datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S") >= week_ago]
+    with _records_lock:
+        period_records = [r for r in records if r["_dt"] >= week_ago]
     title = f"Недельный отчёт ({(now - datetime.timedelta(days=7)).strftime('%d.%m')}–{now.strftime('%d.%m')})"
     return generate_chart(period_records, title)
 
-def generate_monthly_chart() -> str:
+def generate_monthly_chart() -> bytes:
     now = datetime.datetime.now()
-    period_records = [r for r in records if (datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year and
-                                              datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").month == now.month)]
+    with _records_lock:
+        period_records = [r for r in records if (r["_dt"].year == now.year and
+                                                 r["_dt"].month == now.month)]
     title = f"Месячный отчёт за {now.strftime('%B %Y')}"
     return generate_chart(period_records, title)
 
-def generate_yearly_chart() -> str:
+def generate_yearly_chart() -> bytes:
     now = datetime.datetime.now()
-    period_records = [r for r in records if datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year]
+    with _records_lock:
+        period_records = [r for r in records if r["_dt"].year == now.year]
     title = f"Годовой отчёт за {now.year}"
     return generate_chart(period_records, title)
 
 def get_current_balance() -> float:
-    overall_income = sum(r["amount"] for r in records if r["type"] == "доход")
-    overall_expense = sum(r["amount"] for r in records if r["type"] == "расход")
-    return overall_income - overall_expense
+    # Снимок ссылок на массивы под блокировкой: тройка ссылок консистентна,
+    # сами массивы после подмены не мутируются
+    with _records_lock:
+        amounts, types = _amounts, _types
+    overall_income = amounts[types == 0].sum()
+    overall_expense = amounts[types == 1].sum()
+    return float(overall_income - overall_expense)
 
 def generate_daily_summary() -> str:
-    today_str = datetime.datetime.now().strftime("%Y-%m-%d")
-    daily = [r for r in records if r["date"].startswith(today_str)]
-    incomes = [r for r in daily if r["type"] == "доход"]
-    expenses = [r for r in daily if r["type"] == "расход"]
+    now = datetime.datetime.now()
+    day_start = datetime.datetime(now.year, now.month, now.day)
+    day_end = day_start + datetime.timedelta(days=1)
+    # Список отсортирован по _dt, поэтому границы дня находим двоичным
+    # поиском и обходим только срез за сегодня, а не всю историю
+    with _records_lock:
+        lo = bisect.bisect_left(records, day_start, key=lambda r: r["_dt"])
+        hi = bisect.bisect_left(records, day_end, key=lambda r: r["_dt"])
+        daily = records[lo:hi]
+    incomes = [r for r in daily if r["_t"] == 0]
+    expenses = [r for r in daily if r["_t"] == 1]
     total_income = sum(r["amount"] for r in incomes)
     total_expense = sum(r["amount"] for r in expenses)
     balance_day = total_income - total_expense
@@ -238,9 +469,11 @@ def generate_daily_summary() -> str:
 def generate_weekly_summary() -> str:
     now = datetime.datetime.now()
     week_ago = now - datetime.timedelta(days=7)
-    weekly = [r for r in records if datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S") >= week_ago]
-    total_income = sum(r["amount"] for r in weekly if r["type"] == "доход")
-    total_expense = sum(r["amount"] for r in weekly if r["type"] == "расход")
+    with _records_lock:
+        amounts, types, dates = _amounts, _types, _dates
+    mask = dates >= np.datetime64(week_ago, "s")
+    total_income = float(amounts[mask & (types == 0)].sum())
+    total_expense = float(amounts[mask & (types == 1)].sum())
     balance_week = total_income - total_expense
     text = f"📆 Недельный отчёт ({(now - datetime.timedelta(days=7)).strftime('%d.%m')}–{now.strftime('%d.%m')}):\n\n"
     text += f"✅ Доход: {total_income} руб.\n❌ Расход: {total_expense} руб.\n💰 Баланс: {'+' if balance_week >= 0 else ''}{balance_week} руб."
@@ -248,10 +481,12 @@ def generate_weekly_summary() -> str:
 
 def generate_monthly_summary() -> str:
     now = datetime.datetime.now()
-    monthly = [r for r in records if (datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year and
-                                       datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").month == now.month)]
-    total_income = sum(r["amount"] for r in monthly if r["type"] == "доход")
-    total_expense = sum(r["amount"] for r in monthly if r["type"] == "расход")
+    month_start, month_end = _month_bounds(now)
+    with _records_lock:
+        amounts, types, dates = _amounts, _types, _dates
+    mask = (dates >= np.datetime64(month_start, "s")) & (dates < np.datetime64(month_end, "s"))
+    total_income = float(amounts[mask & (types == 0)].sum())
+    total_expense = float(amounts[mask & (types == 1)].sum())
     balance_month = total_income - total_expense
     text = f"📈 Месячный отчёт за {now.strftime('%B %Y')}:\n\n"
     text += f"✅ Доход: {total_income} руб.\n❌ Расход: {total_expense} руб.\n💳 Баланс: {'+' if balance_month >= 0 else ''}{balance_month} руб."
@@ -259,9 +494,12 @@ def generate_monthly_summary() -> str:
 
 def generate_yearly_summary() -> str:
     now = datetime.datetime.now()
-    yearly = [r for r in records if datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year]
-    total_income = sum(r["amount"] for r in yearly if r["type"] == "доход")
-    total_expense = sum(r["amount"] for r in yearly if r["type"] == "расход")
+    with _records_lock:
+        amounts, types, dates = _amounts, _types, _dates
+    mask = ((dates >= np.datetime64(datetime.datetime(now.year, 1, 1), "s")) &
+            (dates < np.datetime64(datetime.datetime(now.year + 1, 1, 1), "s")))
+    total_income = float(amounts[mask & (types == 0)].sum())
+    total_expense = float(amounts[mask & (types == 1)].sum())
     balance_year = total_income - total_expense
     text = f"📊 Годовой отчёт за {now.year}:\n\n"
     text += f"✅ Доход: {total_income} руб.\n❌ Расход: {total_expense} руб.\n💵 Баланс: {'+' if balance_year >= 0 else ''}{balance_year} руб."
@@ -279,36 +517,60 @@ def update_balance_sheet() -> None:
         logging.error("Google Sheets недоступен. Не удается обновить баланс.")
         return
     try:
-        overall_income = sum(r["amount"] for r in records if r["type"] == "доход")
-        overall_expense = sum(r["amount"] for r in records if r["type"] == "расход")
-        overall_balance = overall_income - overall_expense
-
         now = datetime.datetime.now()
         week_ago = now - datetime.timedelta(days=7)
-        weekly_income = sum(r["amount"] for r in records 
-                            if r["type"] == "доход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S") >= week_ago)
-        weekly_expense = sum(r["amount"] for r in records 
-                             if r["type"] == "расход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S") >= week_ago)
-        weekly_balance = weekly_income - weekly_expense
+        month_start, month_end = _month_bounds(now)
+
+        year_start = datetime.datetime(now.year, 1, 1)
+        year_end = datetime.datetime(now.year + 1, 1, 1)
+
+        with _records_lock:
+            amounts, types, dates = _amounts, _types, _dates
+
+        if _agg_kernel is not None:
+            # Скомпилированное ядро: все восемь сумм за один проход по массивам
+            sums = _agg_kernel(
+                amounts, types, dates.view(np.int64),
+                np.datetime64(week_ago, "s").astype(np.int64),
+                np.datetime64(month_start, "s").astype(np.int64),
+                np.datetime64(month_end, "s").astype(np.int64),
+                np.datetime64(year_start, "s").astype(np.int64),
+                np.datetime64(year_end, "s").astype(np.int64),
+            )
+            overall_income, overall_expense = float(sums[0, 0]), float(sums[0, 1])
+            weekly_income, weekly_expense = float(sums[1, 0]), float(sums[1, 1])
+            monthly_income, monthly_expense = float(sums[2, 0]), float(sums[2, 1])
+            yearly_income, yearly_expense = float(sums[3, 0]), float(sums[3, 1])
+        else:
+            # Векторные маскированные суммы по SoA-массивам вместо обхода списка
+            income_mask = types == 0
+            expense_mask = ~income_mask
+            week_mask = dates >= np.datetime64(week_ago, "s")
+            month_mask = (dates >= np.datetime64(month_start, "s")) & (dates < np.datetime64(month_end, "s"))
+            year_mask = ((dates >= np.datetime64(year_start, "s")) &
+                         (dates < np.datetime64(year_end, "s")))
+
+            overall_income = float(amounts[income_mask].sum())
+            overall_expense = float(amounts[expense_mask].sum())
+            weekly_income = float(amounts[income_mask & week_mask].sum())
+            weekly_expense = float(amounts[expense_mask & week_mask].sum())
+            monthly_income = float(amounts[income_mask & month_mask].sum())
+            monthly_expense = float(amounts[expense_mask & month_mask].sum())
+            yearly_income = float(amounts[income_mask & year_mask].sum())
+            yearly_expense = float(amounts[expense_mask & year_mask].sum())
 
-        monthly_income = sum(r["amount"] for r in records 
-                             if r["type"] == "доход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year and
-                             datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").month == now.month)
-        monthly_expense = sum(r["amount"] for r in records 
-                              if r["type"] == "расход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year and
-                              datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").month == now.month)
+        overall_balance = overall_income - overall_expense
+        weekly_balance = weekly_income - weekly_expense
         monthly_balance = monthly_income - monthly_expense
-
-        yearly_income = sum(r["amount"] for r in records 
-                            if r["type"] == "доход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year)
-        yearly_expense = sum(r["amount"] for r in records 
-                             if r["type"] == "расход" and datetime.datetime.strptime(r["date"], "%Y-%m-%d %H:%M:%S").year == now.year)
         yearly_balance = yearly_income - yearly_expense
 
-        balance_sheet.update([["Общий баланс", overall_balance, "", ""]], "A1:D1")
-        balance_sheet.update([["Данные недели", weekly_income, weekly_expense, weekly_balance]], "A2:D2")
-        balance_sheet.update([["Данные месяца", monthly_income, monthly_expense, monthly_balance]], "A3:D3")
-        balance_sheet.update([["Данные года", yearly_income, yearly_expense, yearly_balance]], "A4:D4")
+        # Все четыре строки отправляем одним запросом вместо четырёх round-trip'ов
+        balance_sheet.batch_update([
+            {"range": "A1:D1", "values": [["Общий баланс", overall_balance, "", ""]]},
+            {"range": "A2:D2", "values": [["Данные недели", weekly_income, weekly_expense, weekly_balance]]},
+            {"range": "A3:D3", "values": [["Данные месяца", monthly_income, monthly_expense, monthly_balance]]},
+            {"range": "A4:D4", "values": [["Данные года", yearly_income, yearly_expense, yearly_balance]]},
+        ])
         logging.info("Лист 'Баланс' успешно обновлен.")
     except Exception as e:
         logging.error(f"Ошибка обновления листа 'Баланс': {e}")
@@ -316,50 +578,67 @@ def update_balance_sheet() -> None:
 # ---------------------------------------------------------------------------- #
 #                     Функции создания клавиатур для меню                        #
 # ---------------------------------------------------------------------------- #
-def get_main_menu_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="➕ Доход"), KeyboardButton(text="➖ Расход")],
-            [KeyboardButton(text="💰 Баланс"), KeyboardButton(text="📊 Отчёты")]
-        ],
-        resize_keyboard=True
-    )
-
-def get_income_keyboard() -> types.InlineKeyboardMarkup:
-    return types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [types.InlineKeyboardButton(text="Бизнес", callback_data="income_business")],
-            [types.InlineKeyboardButton(text="Инвестиции", callback_data="income_investments")],
-            [types.InlineKeyboardButton(text="Пассивный Доход", callback_data="income_passive")],
-            [types.InlineKeyboardButton(text="Дополнительный Доход", callback_data="income_additional")]
-        ]
-    )
-
-def get_expense_keyboard() -> types.InlineKeyboardMarkup:
-    return types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [types.InlineKeyboardButton(text="Жилье", callback_data="expense_housing"),
-             types.InlineKeyboardButton(text="Продукты", callback_data="expense_products"),
-             types.InlineKeyboardButton(text="Кафе и Рестораны", callback_data="expense_restaurants")],
-            [types.InlineKeyboardButton(text="Развитие", callback_data="expense_development"),
-             types.InlineKeyboardButton(text="Транспорт", callback_data="expense_transport"),
-             types.InlineKeyboardButton(text="Развлечения", callback_data="expense_entertainment")],
-            [types.InlineKeyboardButton(text="Здоровье", callback_data="expense_health"),
-             types.InlineKeyboardButton(text="Стиль", callback_data="expense_style"),
-             types.InlineKeyboardButton(text="Непредвиденные Расходы", callback_data="expense_unexpected")]
-        ]
-    )
-
-def get_reports_menu_keyboard() -> types.InlineKeyboardMarkup:
-    return types.InlineKeyboardMarkup(
-        inline_keyboard=[
-            [types.InlineKeyboardButton(text="🗓️ Ежедневный", callback_data="report_daily")],
-            [types.InlineKeyboardButton(text="📆 Недельный", callback_data="report_weekly")],
-            [types.InlineKeyboardButton(text="📈 Месячный", callback_data="report_monthly")],
-            [types.InlineKeyboardButton(text="📊 Годовой", callback_data="report_yearly")],
-            [types.InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_main")]
-        ]
-    )
+# Соответствие callback-данных названиям категорий; строится один раз при импорте
+INCOME_MAP = {
+    "business": "Бизнес",
+    "investments": "Инвестиции",
+    "passive": "Пассивный Доход",
+    "additional": "Дополнительный Доход"
+}
+
+EXPENSE_MAP = {
+    "housing": "Жилье",
+    "products": "Продукты",
+    "restaurants": "Кафе и Рестораны",
+    "development": "Развитие",
+    "transport": "Транспорт",
+    "entertainment": "Развлечения",
+    "health": "Здоровье",
+    "style": "Стиль",
+    "unexpected": "Непредвиденные Расходы"
+}
+
+# Клавиатуры неизменны, поэтому собираем их один раз, а не на каждый запрос
+MAIN_MENU_KEYBOARD = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="➕ Доход"), KeyboardButton(text="➖ Расход")],
+        [KeyboardButton(text="💰 Баланс"), KeyboardButton(text="📊 Отчёты")]
+    ],
+    resize_keyboard=True
+)
+
+INCOME_KEYBOARD = types.InlineKeyboardMarkup(
+    inline_keyboard=[
+        [types.InlineKeyboardButton(text="Бизнес", callback_data="income_business")],
+        [types.InlineKeyboardButton(text="Инвестиции", callback_data="income_investments")],
+        [types.InlineKeyboardButton(text="Пассивный Доход", callback_data="income_passive")],
+        [types.InlineKeyboardButton(text="Дополнительный Доход", callback_data="income_additional")]
+    ]
+)
+
+EXPENSE_KEYBOARD = types.InlineKeyboardMarkup(
+    inline_keyboard=[
+        [types.InlineKeyboardButton(text="Жилье", callback_data="expense_housing"),
+         types.InlineKeyboardButton(text="Продукты", callback_data="expense_products"),
+         types.InlineKeyboardButton(text="Кафе и Рестораны", callback_data="expense_restaurants")],
+        [types.InlineKeyboardButton(text="Развитие", callback_data="expense_development"),
+         types.InlineKeyboardButton(text="Транспорт", callback_data="expense_transport"),
+         types.InlineKeyboardButton(text="Развлечения", callback_data="expense_entertainment")],
+        [types.InlineKeyboardButton(text="Здоровье", callback_data="expense_health"),
+         types.InlineKeyboardButton(text="Стиль", callback_data="expense_style"),
+         types.InlineKeyboardButton(text="Непредвиденные Расходы", callback_data="expense_unexpected")]
+    ]
+)
+
+REPORTS_MENU_KEYBOARD = types.InlineKeyboardMarkup(
+    inline_keyboard=[
+        [types.InlineKeyboardButton(text="🗓️ Ежедневный", callback_data="report_daily")],
+        [types.InlineKeyboardButton(text="📆 Недельный", callback_data="report_weekly")],
+        [types.InlineKeyboardButton(text="📈 Месячный", callback_data="report_monthly")],
+        [types.InlineKeyboardButton(text="📊 Годовой", callback_data="report_yearly")],
+        [types.InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_main")]
+    ]
+)
 
 # ---------------------------------------------------------------------------- #
 #                    Обработчики команд и событий бота                         #
@@ -368,105 +647,88 @@ def get_reports_menu_keyboard() -> types.InlineKeyboardMarkup:
 async def cmd_start(message: types.Message):
     registered_users.add(message.from_user.id)
     logging.info(f"Пользователь {message.from_user.id} запустил бота.")
-    await message.answer("Добро пожаловать! Выберите действие:", reply_markup=get_main_menu_keyboard())
+    await message.answer("Добро пожаловать! Выберите действие:", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.message(lambda m: m.text == "➕ Доход")
+@dp.message(F.text == "➕ Доход")
 async def choose_income_handler(message: types.Message):
     logging.info(f"Пользователь {message.from_user.id} выбрал доход.")
-    await message.answer("Выберите категорию дохода:", reply_markup=get_income_keyboard())
+    await message.answer("Выберите категорию дохода:", reply_markup=INCOME_KEYBOARD)
 
-@dp.message(lambda m: m.text == "➖ Расход")
+@dp.message(F.text == "➖ Расход")
 async def choose_expense_handler(message: types.Message):
     logging.info(f"Пользователь {message.from_user.id} выбрал расход.")
-    await message.answer("Выберите категорию расхода:", reply_markup=get_expense_keyboard())
+    await message.answer("Выберите категорию расхода:", reply_markup=EXPENSE_KEYBOARD)
 
-@dp.message(lambda m: m.text == "💰 Баланс")
+@dp.message(F.text == "💰 Баланс")
 async def show_balance_handler(message: types.Message):
     balance = get_current_balance()
     logging.info(f"Пользователь {message.from_user.id} запросил баланс: {balance} руб.")
-    await message.answer(f"Твой текущий баланс: {'+' if balance >= 0 else ''}{balance} руб.", reply_markup=get_main_menu_keyboard())
+    await message.answer(f"Твой текущий баланс: {'+' if balance >= 0 else ''}{balance} руб.", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.message(lambda m: m.text == "📊 Отчёты")
+@dp.message(F.text == "📊 Отчёты")
 async def choose_reports_handler(message: types.Message):
     logging.info(f"Пользователь {message.from_user.id} запросил отчёты.")
-    await message.answer("Выберите тип отчёта:", reply_markup=get_reports_menu_keyboard())
+    await message.answer("Выберите тип отчёта:", reply_markup=REPORTS_MENU_KEYBOARD)
 
-@dp.callback_query(lambda c: c.data.startswith("income_"))
+@dp.callback_query(F.data.startswith("income_"))
 async def process_income_category(callback: types.CallbackQuery):
     data = callback.data[len("income_"):]
-    mapping = {
-        "business": "Бизнес",
-        "investments": "Инвестиции",
-        "passive": "Пассивный Доход",
-        "additional": "Дополнительный Доход"
-    }
-    chosen = mapping.get(data, "Неизвестная категория")
+    chosen = INCOME_MAP.get(data, "Неизвестная категория")
     pending_inputs[callback.from_user.id] = {"type": "доход", "category": chosen}
     logging.info(f"Пользователь {callback.from_user.id} выбрал категорию дохода: {chosen}")
     await callback.answer()
     await bot.send_message(callback.from_user.id,
                            f"Вы выбрали: {chosen}\nВведите сумму и опциональный комментарий")
 
-@dp.callback_query(lambda c: c.data.startswith("expense_") and not c.data.startswith("expense_group_"))
+@dp.callback_query(F.data.startswith("expense_") & ~F.data.startswith("expense_group_"))
 async def process_expense_category(callback: types.CallbackQuery):
     data = callback.data[len("expense_"):]
-    mapping = {
-        "housing": "Жилье",
-        "products": "Продукты",
-        "restaurants": "Кафе и Рестораны",
-        "development": "Развитие",
-        "transport": "Транспорт",
-        "entertainment": "Развлечения",
-        "health": "Здоровье",
-        "style": "Стиль",
-        "unexpected": "Непредвиденные Расходы"
-    }
-    chosen = mapping.get(data, "Неизвестная категория")
+    chosen = EXPENSE_MAP.get(data, "Неизвестная категория")
     pending_inputs[callback.from_user.id] = {"type": "расход", "category": chosen}
     logging.info(f"Пользователь {callback.from_user.id} выбрал категорию расхода: {chosen}")
     await callback.answer()
     await bot.send_message(callback.from_user.id,
                            f"Вы выбрали: {chosen}\nВведите сумму и опциональный комментарий")
 
-@dp.callback_query(lambda c: c.data == "report_daily")
+@dp.callback_query(F.data == "report_daily")
 async def process_report_daily(callback: types.CallbackQuery):
     logging.info(f"Пользователь {callback.from_user.id} запросил ежедневный отчёт.")
     await callback.answer()
     text_report = generate_daily_summary()
     await bot.send_message(callback.from_user.id, text_report)
-    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=get_main_menu_keyboard())
+    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.callback_query(lambda c: c.data == "report_weekly")
+@dp.callback_query(F.data == "report_weekly")
 async def process_report_weekly(callback: types.CallbackQuery):
     logging.info(f"Пользователь {callback.from_user.id} запросил недельный отчёт.")
     await callback.answer()
     text_report = generate_weekly_summary()
-    chart_file = generate_weekly_chart()
-    photo = FSInputFile(chart_file)
+    chart_bytes = await asyncio.to_thread(generate_weekly_chart)
+    photo = BufferedInputFile(chart_bytes, filename="weekly.png")
     await bot.send_photo(callback.from_user.id, photo=photo, caption=text_report)
-    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=get_main_menu_keyboard())
+    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.callback_query(lambda c: c.data == "report_monthly")
+@dp.callback_query(F.data == "report_monthly")
 async def process_report_monthly(callback: types.CallbackQuery):
     logging.info(f"Пользователь {callback.from_user.id} запросил месячный отчёт.")
     await callback.answer()
     text_report = generate_monthly_summary()
-    chart_file = generate_monthly_chart()
-    photo = FSInputFile(chart_file)
+    chart_bytes = await asyncio.to_thread(generate_monthly_chart)
+    photo = BufferedInputFile(chart_bytes, filename="monthly.png")
     await bot.send_photo(callback.from_user.id, photo=photo, caption=text_report)
-    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=get_main_menu_keyboard())
+    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.callback_query(lambda c: c.data == "report_yearly")
+@dp.callback_query(F.data == "report_yearly")
 async def process_report_yearly(callback: types.CallbackQuery):
     logging.info(f"Пользователь {callback.from_user.id} запросил годовой отчёт.")
     await callback.answer()
     text_report = generate_yearly_summary()
-    chart_file = generate_yearly_chart()
-    photo = FSInputFile(chart_file)
+    chart_bytes = await asyncio.to_thread(generate_yearly_chart)
+    photo = BufferedInputFile(chart_bytes, filename="yearly.png")
     await bot.send_photo(callback.from_user.id, photo=photo, caption=text_report)
-    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=get_main_menu_keyboard())
+    await bot.send_message(callback.from_user.id, "Главное меню:", reply_markup=MAIN_MENU_KEYBOARD)
 
-@dp.message(lambda message: message.from_user.id in pending_inputs)
+@dp.message(F.from_user.id.func(lambda uid: uid in pending_inputs))
 async def process_manual_input(message: types.Message):
     user_id = message.from_user.id
     pending = pending_inputs.get(user_id)
@@ -492,7 +754,7 @@ async def process_manual_input(message: types.Message):
         "amount": amount,
         "comment": comment
     }
-    if save_record(record):
+    if await asyncio.to_thread(save_record, record):
         await message.reply(
             f"Запись сохранена:\nДата: {record['date']}\nТип: {record['type']}\nКатегория: {record['category']}\n"
             f"Сумма: {record['amount']}\nКомментарий: {record['comment']}"
@@ -502,16 +764,59 @@ async def process_manual_input(message: types.Message):
         await message.reply("Такая запись уже существует.")
         logging.info(f"Попытка дублирования записи пользователем {user_id}.")
     del pending_inputs[user_id]
-    await bot.send_message(message.from_user.id, "Главное меню:", reply_markup=get_main_menu_keyboard())
+    await bot.send_message(message.from_user.id, "Главное меню:", reply_markup=MAIN_MENU_KEYBOARD)
 
 # ---------------------------------------------------------------------------- #
 #         Фоновые задачи для обновления листа "Баланс" и отправки отчётов       #
 # ---------------------------------------------------------------------------- #
+# Ограничитель параллельной рассылки: глобальный лимит Telegram — ~30 сообщений/с
+_SEND_SEMAPHORE = asyncio.Semaphore(30)
+
+async def broadcast_message(text: str, report_name: str) -> None:
+    """Рассылает текстовый отчёт всем пользователям параллельно."""
+    async def _send(user_id: int) -> None:
+        async with _SEND_SEMAPHORE:
+            try:
+                await bot.send_message(user_id, text)
+            except Exception as e:
+                logging.error(f"Ошибка отправки {report_name} пользователю {user_id}: {e}")
+    await asyncio.gather(*(_send(user_id) for user_id in registered_users))
+
+async def broadcast_photo(chart_bytes: bytes, caption: str, report_name: str,
+                          filename: str = "chart.png") -> None:
+    """
+    Рассылает график всем зарегистрированным пользователям.
+    Изображение загружается в Telegram только при первой отправке; остальным
+    пользователям фото уходит параллельно по полученному file_id
+    без повторной загрузки.
+    """
+    users = list(registered_users)
+    if not users:
+        return
+    file_id = None
+    try:
+        msg = await bot.send_photo(users[0], photo=BufferedInputFile(chart_bytes, filename=filename),
+                                   caption=caption)
+        if msg.photo:
+            file_id = msg.photo[-1].file_id
+    except Exception as e:
+        logging.error(f"Ошибка отправки {report_name} пользователю {users[0]}: {e}")
+
+    async def _send(user_id: int) -> None:
+        async with _SEND_SEMAPHORE:
+            try:
+                photo = file_id or BufferedInputFile(chart_bytes, filename=filename)
+                await bot.send_photo(user_id, photo=photo, caption=caption)
+            except Exception as e:
+                logging.error(f"Ошибка отправки {report_name} пользователю {user_id}: {e}")
+    await asyncio.gather(*(_send(user_id) for user_id in users[1:]))
+
 async def update_balance_task():
     """Фоновая задача, которая каждые 5 минут обновляет данные из Google Sheets и лист 'Баланс'."""
     while True:
-        load_records()
-        update_balance_sheet()
+        # Блокирующие вызовы Sheets выполняем в пуле потоков, не стопоря event loop
+        await asyncio.to_thread(refresh_records)
+        await asyncio.to_thread(update_balance_sheet)
         await asyncio.sleep(300)
 
 async def daily_summary_task():
@@ -522,13 +827,9 @@ async def daily_summary_task():
             target += datetime.timedelta(days=1)
         delay = (target - now).total_seconds()
         await asyncio.sleep(delay)
-        load_records()
+        await asyncio.to_thread(load_records)
         text_report = generate_daily_summary()
-        for user_id in registered_users:
-            try:
-                await bot.send_message(user_id, text_report)
-            except Exception as e:
-                logging.error(f"Ошибка отправки ежедневного отчёта пользователю {user_id}: {e}")
+        await broadcast_message(text_report, "ежедневного отчёта")
         await asyncio.sleep(60)
 
 async def weekly_summary_task():
@@ -540,15 +841,10 @@ async def weekly_summary_task():
             target += datetime.timedelta(weeks=1)
         delay = (target - now).total_seconds()
         await asyncio.sleep(delay)
-        load_records()
+        await asyncio.to_thread(load_records)
         text_report = generate_weekly_summary()
-        chart_file = generate_weekly_chart()
-        photo = FSInputFile(chart_file)
-        for user_id in registered_users:
-            try:
-                await bot.send_photo(user_id, photo=photo, caption=text_report)
-            except Exception as e:
-                logging.error(f"Ошибка отправки недельного отчёта пользователю {user_id}: {e}")
+        chart_bytes = await asyncio.to_thread(generate_weekly_chart)
+        await broadcast_photo(chart_bytes, text_report, "недельного отчёта", filename="weekly.png")
         await asyncio.sleep(60)
 
 async def monthly_summary_task():
@@ -563,37 +859,27 @@ async def monthly_summary_task():
                 target = datetime.datetime(now.year, now.month + 1, 1, 10, 0, 0)
         delay = (target - now).total_seconds()
         await asyncio.sleep(delay)
-        load_records()
+        await asyncio.to_thread(load_records)
         text_report = generate_monthly_summary()
-        chart_file = generate_monthly_chart()
-        photo = FSInputFile(chart_file)
-        for user_id in registered_users:
-            try:
-                await bot.send_photo(user_id, photo=photo, caption=text_report)
-            except Exception as e:
-                logging.error(f"Ошибка отправки месячного отчёта пользователю {user_id}: {e}")
+        chart_bytes = await asyncio.to_thread(generate_monthly_chart)
+        await broadcast_photo(chart_bytes, text_report, "месячного отчёта", filename="monthly.png")
         await asyncio.sleep(60)
 
 async def yearly_summary_task():
     while True:
         # Обновление годового отчёта раз в 24 часа
         await asyncio.sleep(86400)
-        load_records()
+        await asyncio.to_thread(load_records)
         text_report = generate_yearly_summary()
-        chart_file = generate_yearly_chart()
-        photo = FSInputFile(chart_file)
-        for user_id in registered_users:
-            try:
-                await bot.send_photo(user_id, photo=photo, caption=text_report)
-            except Exception as e:
-                logging.error(f"Ошибка отправки годового отчёта пользователю {user_id}: {e}")
+        chart_bytes = await asyncio.to_thread(generate_yearly_chart)
+        await broadcast_photo(chart_bytes, text_report, "годового отчёта", filename="yearly.png")
 
 # ---------------------------------------------------------------------------- #
 #                             Основная функция                               #
 # ---------------------------------------------------------------------------- #
 async def main():
     try:
-        load_records()  # Начальная загрузка данных из Google Sheets
+        await asyncio.to_thread(load_records)  # Начальная загрузка данных из Google Sheets
     except Exception as e:
         logging.error(f"Ошибка при начальной загрузке записей: {e}")
     asyncio.create_task(update_balance_task())